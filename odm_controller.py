@@ -1,15 +1,390 @@
-from typing import Any, Dict, Optional, List, Tuple
+from typing import Any, Callable, ClassVar, Dict, FrozenSet, NamedTuple, Optional, List, Set, Tuple
+import copy
 import json
+import math
 import os
+import re
 import datetime as _dt
-from uuid import uuid4
+from dataclasses import dataclass
 from pathlib import Path
 
+try:  # orjson es opcional: acelera carga del mapping y serialización del request
+    import orjson
+except ImportError:
+    orjson = None
+
 DEFAULT_ODM_URL: str = "https://odmdds.grouperci.com/DecisionService/rest/Credit_Risk_ES/CO/"
 ODM_DATE_FORMAT: str = "%Y-%m-%d"  # salida canónica de fechas para ODM
 DEFAULT_MAPPING_PATH: str = str(Path(__file__).with_name("mapping.json"))  # mapping.json junto a esta clase
 
 
+def _orjson_exact(obj: Any) -> bool:
+    """
+    True si orjson.dumps(obj) coincide byte a byte con json.dumps(obj, ensure_ascii=False): solo
+    tipos JSON exactos (sin subclases, Enum, UUID, datetime...), claves str y floats finitos cuyo
+    repr no usa exponente (orjson escribe 0.00001/1e16 donde la stdlib escribe 1e-05/1e+16).
+    """
+    t = type(obj)
+    if t is str or t is int or t is bool or obj is None:
+        return True
+    if t is float:
+        return math.isfinite(obj) and "e" not in repr(obj)
+    if t is dict:
+        for k, v in obj.items():
+            if type(k) is not str or not _orjson_exact(v):
+                return False
+        return True
+    if t is list:
+        return all(map(_orjson_exact, obj))
+    return False
+
+
+def _dumps(obj: Any, indent: Optional[int]) -> str:
+    """json.dumps(obj, ensure_ascii=False, indent=indent); usa orjson solo si la salida es idéntica (indent=2)."""
+    if orjson is not None and indent == 2 and _orjson_exact(obj):
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+        except TypeError:  # enteros fuera de 64 bits, surrogates sueltos...
+            pass
+    return json.dumps(obj, ensure_ascii=False, indent=indent)
+
+
+def _loads(data: bytes) -> Any:
+    """Parsea JSON UTF-8; usa orjson si está disponible y la stdlib ante lo que orjson rechaza (NaN, BOM...)."""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data.decode("utf-8"))
+
+
+def _new_decision_id() -> str:
+    return f"Decision_{os.urandom(6).hex()}"
+
+
+_MISSING = object()  # centinela: clave ausente en external_flat
+
+# Colecciones tipadas de coRequest, en el orden en que se emiten
+VARIABLE_LISTS: Tuple[str, ...] = (
+    "dateVariables", "doubleVariables", "integerVariables", "stringVariables", "listOfDoubleVariables",
+)
+
+_Writer = Callable[[List[Dict[str, Any]], str, Any], None]
+
+
+class Op(NamedTuple):
+    """Entrada del mapping ya resuelta: origen, transformación, default y destino."""
+    vtype: Optional[str]  # None para co_fields
+    odm_name: str
+    src_key: Any
+    transform: Optional[Callable[[Any], Any]]  # None = identidad
+    has_default: bool
+    default: Any  # co_fields: valor tal cual; variables: entrada {"name", "value"} ya tipada (o None)
+    slot: int  # índice en CompiledMapping.list_names (-1 para co_fields)
+    writer: Optional[_Writer]
+
+
+@dataclass(slots=True)
+class CompiledMapping:
+    """Mapping 'by_odm' precompilado en tuplas planas para recorrer sin dicts anidados."""
+    co_constants: Dict[str, Any]  # base de co (se copia por request)
+    co_mutable_constants: Tuple[Tuple[str, Any], ...]  # constantes dict/list: se clonan por request
+    co_ops: Tuple[Op, ...]
+    # Por slot de list_names: entradas {"name", "value"} ya tipadas; se copian (_copy_entry) al
+    # sembrar cada request para que el resultado devuelto no comparta nada con la caché.
+    var_constants: Tuple[Tuple[Dict[str, Any], ...], ...]
+    produced_constants: Tuple[str, ...]
+    var_ops: Tuple[Op, ...]
+    list_names: Tuple[str, ...]  # colecciones de VARIABLE_LISTS que el mapping puede llenar
+    required: FrozenSet[str]
+
+
+def _fresh(v: Any) -> Any:
+    """Copia profunda de valores mutables (dict/list) procedentes del mapping cacheado."""
+    return copy.deepcopy(v) if isinstance(v, (dict, list)) else v
+
+
+def _copy_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Copia de una entrada {"name", "value"} precompilada (value es escalar o lista de floats)."""
+    value = entry["value"]
+    return {"name": entry["name"], "value": list(value) if type(value) is list else value}
+
+
+def _normalize_date(v: Any, fmt_in: Optional[str]) -> Optional[str]:
+    if v is None or v == "":
+        return None
+    # str primero: es el caso habitual (entrada JSON)
+    if isinstance(v, str):
+        s = v.strip()
+        if fmt_in:
+            return _dt.datetime.strptime(s, fmt_in).date().strftime(ODM_DATE_FORMAT)
+        return _dt.date.fromisoformat(s[:10]).strftime(ODM_DATE_FORMAT)
+    if isinstance(v, _dt.datetime):
+        return v.date().strftime(ODM_DATE_FORMAT)
+    if isinstance(v, _dt.date):
+        return v.strftime(ODM_DATE_FORMAT)
+    raise ValueError(f"Fecha inválida ({type(v)})")
+
+
+_CSV_SPLIT = re.compile(r"[,;]").split  # separadores de split_csv
+
+# Directivas de fecha con parser propio; mismos patrones que usa strptime para cada una
+_DATE_DIRECTIVES: Dict[str, str] = {
+    "Y": r"(?P<Y>\d\d\d\d)",
+    "m": r"(?P<m>1[0-2]|0[1-9]|[1-9])",
+    "d": r"(?P<d>3[01]|[12]\d|0[1-9]|[1-9]| [1-9])",
+}
+
+
+def _date_format_regex(fmt_in: str) -> Optional["re.Pattern[str]"]:
+    """Traduce un formato strptime con %Y, %m y %d (una vez cada una) a regex; None si no es posible."""
+    parts: List[str] = []
+    seen = set()
+    for i, chunk in enumerate(re.split(r"%(.)", fmt_in)):
+        if i % 2:
+            if chunk not in _DATE_DIRECTIVES or chunk in seen:
+                return None
+            seen.add(chunk)
+            parts.append(_DATE_DIRECTIVES[chunk])
+        elif chunk:
+            # strptime trata cualquier racha de espacios del formato como \s+
+            parts.append(r"\s+".join(re.escape(lit) for lit in re.split(r"\s+", chunk)))
+    if len(seen) != len(_DATE_DIRECTIVES) or "%" in fmt_in[-1:]:
+        return None
+    return re.compile("".join(parts), re.IGNORECASE)
+
+
+def _compile_date_parser(fmt_in: Optional[str]) -> Callable[[Any], Optional[str]]:
+    """
+    Devuelve un normalizador de fechas para 'date_in'. Para formatos con %Y/%m/%d usa una
+    regex precompilada (evita que strptime reinterprete el formato en cada llamada); el
+    resto de casos y cualquier entrada que no encaje pasan por _normalize_date.
+    """
+    rx = _date_format_regex(fmt_in) if fmt_in and ODM_DATE_FORMAT == "%Y-%m-%d" else None
+    if rx is None:
+        return lambda v, _fmt=fmt_in: _normalize_date(v, _fmt)
+
+    def _parse(v: Any, _match: Callable[[str], Any] = rx.fullmatch) -> Optional[str]:
+        if isinstance(v, str):
+            m = _match(v.strip())
+            if m is not None:
+                d = _dt.date(int(m["Y"]), int(m["m"]), int(m["d"]))
+                return d.isoformat() if d.year >= 1000 else d.strftime(ODM_DATE_FORMAT)
+        return _normalize_date(v, fmt_in)
+    return _parse
+
+
+def _compile_transform(cfg: Dict[str, Any]) -> Optional[Callable[[Any], Any]]:
+    """
+    Especializa las transformaciones de un cfg en un callable que solo ejecuta los pasos
+    presentes. Devuelve None si el cfg es la identidad.
+    Transformaciones soportadas (opcionales en mapping):
+      - default: valor por defecto si el input viene vacío
+      - map_from: dict de sustitución exacta (origen -> ODM) (alias 'map')
+      - split_csv: "1, 2;3" -> ["1","2","3"] (se castea después si es list_double)
+      - date_in: formato de entrada (salida siempre ODM_DATE_FORMAT)
+      - strip | upper | lower: sobre strings
+      - bool_map: {"S": true, "N": false}
+      - scale: multiplica (para números)
+    """
+    if not cfg:
+        return None
+    # Se lee cada clave una sola vez (_MISSING distingue "ausente" de un valor falsy)
+    _get = cfg.get
+    default = _get("default", _MISSING)
+    map_from = _get("map_from") or _get("map")
+    split_csv = _get("split_csv")
+    date_in = _get("date_in", _MISSING)
+    as_date = _get("as_date")
+    strip, upper, lower = _get("strip"), _get("upper"), _get("lower")
+    bool_map = _get("bool_map")
+    scale = _get("scale", _MISSING)
+
+    steps: List[Callable[[Any], Any]] = []
+
+    if default is not _MISSING:
+        def _default(v: Any, _d: Any = default, _copy: Callable[[Any], Any] = _fresh) -> Any:
+            if v is None or (isinstance(v, str) and v.strip() == ""):
+                return _copy(_d)
+            return v
+        steps.append(_default)
+
+    # Mapeo exacto de valores de entrada
+    if isinstance(map_from, dict):
+        if any(isinstance(x, (dict, list)) for x in map_from.values()):
+            steps.append(lambda v, _get=map_from.get: _fresh(_get(v, v)))
+        else:
+            steps.append(lambda v, _get=map_from.get: _get(v, v))
+
+    # CSV -> lista
+    if split_csv:
+        def _split_csv(v: Any, _split: Callable[[str], List[str]] = _CSV_SPLIT) -> Any:
+            if isinstance(v, str):
+                return [t for t in (tok.strip() for tok in _split(v)) if t]
+            return v
+        steps.append(_split_csv)
+
+    # Fechas: se especifica 'date_in'; salida fija ODM_DATE_FORMAT
+    if date_in is not _MISSING or as_date:
+        steps.append(_compile_date_parser(None if date_in is _MISSING else date_in))
+
+    # Strings
+    str_fns = tuple(fn for flag, fn in ((strip, str.strip), (upper, str.upper), (lower, str.lower)) if flag)
+    if len(str_fns) == 1:
+        steps.append(lambda v, _fn=str_fns[0]: _fn(v) if isinstance(v, str) else v)
+    elif str_fns:
+        def _strings(v: Any) -> Any:
+            if isinstance(v, str):
+                for fn in str_fns:
+                    v = fn(v)
+            return v
+        steps.append(_strings)
+
+    # Booleano mapeado
+    if isinstance(bool_map, dict):
+        steps.append(lambda v, _get=bool_map.get: _get(v, bool(v)))
+
+    # Escala numérica (una escala no numérica deja el valor intacto, como antes)
+    if scale is not _MISSING:
+        try:
+            factor: Optional[float] = float(scale)
+        except Exception:
+            factor = None
+        if factor is not None:
+            def _scale(v: Any, _s: float = factor) -> Any:
+                if v is None:
+                    return v
+                try:
+                    return float(v) * _s
+                except Exception:
+                    return v
+            steps.append(_scale)
+
+    if not steps:
+        return None
+    if len(steps) == 1:
+        return steps[0]
+
+    def _transform(v: Any, _steps: Tuple[Callable[[Any], Any], ...] = tuple(steps)) -> Any:
+        for step in _steps:
+            v = step(v)
+        return v
+    return _transform
+
+
+# ===== Escritores por tipo de variable: (lista destino, nombre, valor no nulo) =====
+def _w_date(lst: List[Dict[str, Any]], name: str, v: Any) -> None:
+    lst.append({"name": name, "value": str(v)})
+
+
+def _w_double(lst: List[Dict[str, Any]], name: str, v: Any) -> None:
+    lst.append({"name": name, "value": float(v)})
+
+
+def _w_integer(lst: List[Dict[str, Any]], name: str, v: Any) -> None:
+    lst.append({"name": name, "value": int(v)})
+
+
+def _w_string(lst: List[Dict[str, Any]], name: str, v: Any) -> None:
+    lst.append({"name": name, "value": str(v)})
+
+
+def _w_list_double(lst: List[Dict[str, Any]], name: str, v: Any) -> None:
+    lst.append({"name": name, "value": [float(x) for x in (v or [])]})
+
+
+# vtype -> (índice en VARIABLE_LISTS, escritor); se resuelve una vez al compilar
+_VTYPE_WRITERS: Dict[str, Tuple[int, _Writer]] = {
+    "date": (0, _w_date),
+    "double": (1, _w_double),
+    "integer": (2, _w_integer),
+    "string": (3, _w_string),
+    "list_double": (4, _w_list_double),
+}
+
+
+def _resolve_writer(vtype: str) -> Tuple[int, _Writer]:
+    try:
+        return _VTYPE_WRITERS[vtype]
+    except KeyError:
+        raise ValueError(f"Tipo de variable no soportado: {vtype}") from None
+
+
+def _bake_entry(writer: _Writer, name: str, value: Any) -> Optional[Dict[str, Any]]:
+    """Entrada {"name", "value"} tipada con el escritor; None si el valor es None (no se emite)."""
+    if value is None:
+        return None
+    baked: List[Dict[str, Any]] = []
+    writer(baked, name, value)
+    return baked[0]
+
+
+def _compile_mapping(mapping: Dict[str, Any]) -> CompiledMapping:
+    """Compila una sola vez el mapping JSON (by_odm) a un CompiledMapping."""
+    constants = mapping.get("constants", {})
+
+    def _op(vtype: Optional[str], odm_name: str, spec: Any) -> Op:
+        # spec {from,...} o atajo "odm_name": "source_key". El cfg sin 'from' solo vive aquí:
+        # queda congelado en el transform compilado y no se consulta por request.
+        if isinstance(spec, str):
+            src_key, cfg = spec, {}
+        else:
+            src_key = spec.get("from")
+            cfg = {k: v for k, v in spec.items() if k != "from"}
+        default = cfg.get("default")
+        if vtype is None:
+            slot, writer = -1, None
+        else:
+            slot, writer = _resolve_writer(vtype)
+            default = _bake_entry(writer, odm_name, default)
+        return Op(vtype, odm_name, src_key, _compile_transform(cfg), "default" in cfg, default, slot, writer)
+
+    # Constantes en variables: se tipan una vez con su escritor
+    var_constants: List[Tuple[int, Dict[str, Any]]] = []
+    produced_constants: List[str] = []
+    for vtype, d in (constants.get("variables", {}) or {}).items():
+        if not d:
+            continue
+        slot, writer = _resolve_writer(vtype)
+        for name, value in d.items():
+            produced_constants.append(name)
+            entry = _bake_entry(writer, name, value)
+            if entry is not None:
+                var_constants.append((slot, entry))
+
+    var_ops = [
+        _op(vtype, odm_name, spec)
+        for vtype, spec_dict in (mapping.get("variables") or {}).items()
+        for odm_name, spec in (spec_dict or {}).items()
+    ]
+
+    co_constants = constants.get("co_fields", {}) or {}
+
+    # Solo se reservan las colecciones que algún op o constante puede llenar; los slots
+    # pasan de índices de VARIABLE_LISTS a índices de list_names.
+    used_slots = sorted({slot for slot, _ in var_constants} | {op.slot for op in var_ops})
+    remap = {slot: i for i, slot in enumerate(used_slots)}
+
+    return CompiledMapping(
+        co_constants=dict(co_constants),
+        co_mutable_constants=tuple((k, v) for k, v in co_constants.items() if isinstance(v, (dict, list))),
+        co_ops=tuple(_op(None, odm_name, spec) for odm_name, spec in (mapping.get("co_fields") or {}).items()),
+        var_constants=tuple(
+            tuple(entry for slot, entry in var_constants if slot == used) for used in used_slots
+        ),
+        produced_constants=tuple(produced_constants),
+        var_ops=tuple(op._replace(slot=remap[op.slot]) for op in var_ops),
+        list_names=tuple(VARIABLE_LISTS[slot] for slot in used_slots),
+        required=frozenset(mapping.get("required_odm", []) or []),
+    )
+
+
+# Caché en proceso de mappings: path -> (st_mtime_ns, st_size, compilado).
+# Los objetos cacheados se comparten entre llamadas: se tratan como de solo lectura.
+_MAPPING_CACHE: Dict[str, Tuple[int, int, CompiledMapping]] = {}
+
+
 class odm_controller:
     """
     Controlador que opera nativamente con el esquema de ODM.
@@ -20,6 +395,11 @@ class odm_controller:
       print(ctrl.get_request_json())  # JSON listo para enviar
     """
 
+    __slots__ = ("odm_url", "headers", "timeout", "odm_request", "odm_response", "mapping_path")
+
+    # Mapping compilado de DEFAULT_MAPPING_PATH: (st_mtime_ns, st_size, compilado)
+    _compiled_default: ClassVar[Optional[Tuple[int, int, CompiledMapping]]] = None
+
     def __init__(
             self,
             odm_url: str = DEFAULT_ODM_URL,
@@ -60,16 +440,15 @@ class odm_controller:
             "constants": { "co_fields": {...}, "variables": { "string": {...} } },
             "required_odm": ["loanAmount", ...]
           }
+        El dict devuelto es del llamador: puede modificarse sin afectar a requests posteriores.
         """
         if not isinstance(external_flat, dict):
             raise TypeError("external_flat debe ser un dict plano.")
-        path = mapping_path or self.mapping_path
-        mapping = self._load_mapping_file_json(path)
-        odm_req, produced_targets = self._build_by_odm_keys(external_flat, mapping, decision_id)
+        compiled = self._load_compiled_mapping(mapping_path or self.mapping_path)
+        odm_req, produced_targets = self._build_by_odm_keys(external_flat, compiled, decision_id)
 
         if validate_required:
-            required_targets = set(mapping.get("required_odm", []) or [])
-            missing_required = [t for t in required_targets if t not in produced_targets]
+            missing_required = list(compiled.required.difference(produced_targets))
             if missing_required:
                 raise ValueError(f"Faltan objetivos ODM requeridos: {missing_required}")
 
@@ -83,167 +462,88 @@ class odm_controller:
         """Devuelve el último ODMRequest construido en formato JSON (string)."""
         if not self.odm_request:
             raise RuntimeError("Aún no hay un ODMRequest construido.")
-        return json.dumps(self.odm_request, ensure_ascii=False, indent=indent)
+        return _dumps(self.odm_request, indent)
 
     # ========================= Internos =========================
+    def _load_compiled_mapping(self, path: str) -> CompiledMapping:
+        """Carga y compila el mapping; se reutiliza mientras el archivo no cambie (mtime/tamaño)."""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"No existe el archivo de mapeo: {path}") from None
+        # Camino habitual (mapping por defecto): se evita incluso la búsqueda en _MAPPING_CACHE
+        is_default = path is DEFAULT_MAPPING_PATH
+        if is_default:
+            default = odm_controller._compiled_default
+            if default is not None and default[0] == st.st_mtime_ns and default[1] == st.st_size:
+                return default[2]
+        cached = _MAPPING_CACHE.get(path)
+        if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            compiled = cached[2]
+        else:
+            compiled = _compile_mapping(self._load_mapping_file_json(path))
+            _MAPPING_CACHE[path] = (st.st_mtime_ns, st.st_size, compiled)
+        if is_default:
+            odm_controller._compiled_default = (st.st_mtime_ns, st.st_size, compiled)
+        return compiled
+
     def _load_mapping_file_json(self, path: str) -> Dict[str, Any]:
-        if not os.path.exists(path):
-            raise FileNotFoundError(f"No existe el archivo de mapeo: {path}")
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        with open(path, "rb") as f:
+            return _loads(f.read())
 
     def _build_by_odm_keys(
             self,
             external_flat: Dict[str, Any],
-            mapping: Dict[str, Any],
+            compiled: CompiledMapping,
             decision_id: Optional[str],
-    ) -> Tuple[Dict[str, Any], List[str]]:
-        """Construye el ODMRequest según mapping 'by_odm'. Devuelve (request, produced_targets)."""
-        co: Dict[str, Any] = {}
-        produced_targets: List[str] = []
-
-        # Constantes en co_fields
-        for k, v in (mapping.get("constants", {}).get("co_fields", {}) or {}).items():
-            co[k] = v
-
-        # co_fields (ODM => spec {from,...} o atajo "odm_name": "source_key")
-        for odm_name, spec in (mapping.get("co_fields") or {}).items():
-            if isinstance(spec, str):
-                src_key, cfg = spec, {}
-            else:
-                src_key = spec.get("from")
-                cfg = dict(spec); cfg.pop("from", None)
-
-            if src_key in external_flat:
-                val = self._apply_transform(external_flat[src_key], cfg)
-                co[odm_name] = val
-                produced_targets.append(odm_name)
-            else:
-                if "default" in cfg:
-                    co[odm_name] = cfg["default"]
-                    produced_targets.append(odm_name)
-
-        # Inicializa colecciones tipadas
-        co["dateVariables"], co["doubleVariables"], co["integerVariables"], co["stringVariables"], co["listOfDoubleVariables"] = [], [], [], [], []
-
-        # Constantes en variables
-        for vtype, d in (mapping.get("constants", {}).get("variables", {}) or {}).items():
-            for name, value in (d or {}).items():
-                self._add_var(co, vtype, name, value)
-                produced_targets.append(name)
-
-        # variables (ODM => spec {from,...} o atajo "odm_name": "source_key")
-        for vtype, spec_dict in (mapping.get("variables") or {}).items():
-            for odm_name, spec in (spec_dict or {}).items():
-                if isinstance(spec, str):
-                    src_key, cfg = spec, {}
-                else:
-                    src_key = spec.get("from")
-                    cfg = dict(spec); cfg.pop("from", None)
-
-                if src_key in external_flat:
-                    val = self._apply_transform(external_flat[src_key], cfg)
-                    self._add_var(co, vtype, odm_name, val)
-                    produced_targets.append(odm_name)
-                else:
-                    if "default" in cfg:
-                        self._add_var(co, vtype, odm_name, cfg["default"])
-                        produced_targets.append(odm_name)
-
-        # Limpia colecciones vacías
-        for k in ("dateVariables", "doubleVariables", "integerVariables", "stringVariables", "listOfDoubleVariables"):
-            if not co[k]:
-                co.pop(k)
-
-        # DecisionID
-        dec_id = decision_id or (self.odm_request or {}).get("__DecisionID__") or f"Decision_{uuid4().hex[:12]}"
-        odm_req = {"__DecisionID__": dec_id, "coRequest": co}
+    ) -> Tuple[Dict[str, Any], Set[str]]:
+        """Construye el ODMRequest según el mapping compilado. Devuelve (request, produced_targets)."""
+        co: Dict[str, Any] = dict(compiled.co_constants)
+        for k, v in compiled.co_mutable_constants:
+            co[k] = copy.deepcopy(v)
+        produced_targets: Set[str] = set()
+
+        # co_fields
+        for op in compiled.co_ops:
+            val = external_flat.get(op.src_key, _MISSING)
+            if val is not _MISSING:
+                co[op.odm_name] = val if op.transform is None else op.transform(val)
+                produced_targets.add(op.odm_name)
+            elif op.has_default:
+                co[op.odm_name] = _fresh(op.default)
+                produced_targets.add(op.odm_name)
+
+        # Variables tipadas (constantes + variables): listas locales, se vuelcan a co solo si no están vacías
+        # Cada colección arranca con sus constantes (entradas ya tipadas al compilar)
+        var_lists: List[List[Dict[str, Any]]] = [
+            [_copy_entry(e) for e in entries] for entries in compiled.var_constants
+        ]
+        produced_targets.update(compiled.produced_constants)
+
+        # variables
+        for op in compiled.var_ops:
+            val = external_flat.get(op.src_key, _MISSING)
+            if val is _MISSING:
+                if op.has_default:
+                    produced_targets.add(op.odm_name)
+                    if op.default is not None:
+                        var_lists[op.slot].append(_copy_entry(op.default))
+                continue
+            if op.transform is not None:
+                val = op.transform(val)
+            produced_targets.add(op.odm_name)
+            if val is not None:
+                op.writer(var_lists[op.slot], op.odm_name, val)
+
+        for k, lst in zip(compiled.list_names, var_lists):
+            if lst:
+                co[k] = lst
+
+        odm_req = {"__DecisionID__": self._resolve_decision_id(decision_id), "coRequest": co}
         return odm_req, produced_targets
 
-    # ===== Helpers de transformaciones =====
-    def _apply_transform(self, value: Any, cfg: Dict[str, Any]) -> Any:
-        """
-        Transformaciones soportadas (opcionales en mapping):
-          - default: valor por defecto si el input viene vacío
-          - map_from: dict de sustitución exacta (origen -> ODM) (alias 'map')
-          - split_csv: "1, 2;3" -> ["1","2","3"] (se castea después si es list_double)
-          - date_in: formato de entrada (salida siempre ODM_DATE_FORMAT)
-          - strip | upper | lower: sobre strings
-          - bool_map: {"S": true, "N": false}
-          - scale: multiplica (para números)
-        """
-        if (value is None or (isinstance(value, str) and value.strip() == "")) and "default" in cfg:
-            value = cfg["default"]
-
-        # Mapeo exacto de valores de entrada
-        map_from = cfg.get("map_from") or cfg.get("map")
-        if isinstance(map_from, dict):
-            value = map_from.get(value, value)
-
-        # CSV -> lista
-        if cfg.get("split_csv") and isinstance(value, str):
-            tokens = [t.strip() for t in value.replace(";", ",").split(",") if t.strip()]
-            value = tokens
-
-        # Fechas: se especifica 'date_in'; salida fija ODM_DATE_FORMAT
-        if "date_in" in cfg or cfg.get("as_date"):
-            value = self._normalize_date(value, cfg.get("date_in"))
-
-        # Strings
-        if isinstance(value, str):
-            if cfg.get("strip"): value = value.strip()
-            if cfg.get("upper"): value = value.upper()
-            if cfg.get("lower"): value = value.lower()
-
-        # Booleano mapeado
-        if isinstance(cfg.get("bool_map"), dict):
-            value = cfg["bool_map"].get(value, bool(value))
-
-        # Escala numérica
-        if "scale" in cfg and value is not None:
-            try:
-                value = float(value) * float(cfg["scale"])
-            except Exception:
-                pass
-
-        return value
-
-    def _add_var(self, co: Dict[str, Any], vtype: str, name: str, value: Any) -> None:
-        if value is None:
-            return
-        if vtype == "date":
-            (co.setdefault("dateVariables", [])).append({"name": name, "value": str(value)})
-        elif vtype == "double":
-            (co.setdefault("doubleVariables", [])).append({"name": name, "value": float(value)})
-        elif vtype == "integer":
-            (co.setdefault("integerVariables", [])).append({"name": name, "value": int(value)})
-        elif vtype == "string":
-            (co.setdefault("stringVariables", [])).append({"name": name, "value": str(value)})
-        elif vtype == "list_double":
-            if isinstance(value, list):
-                vals = [float(x) for x in value]
-            else:
-                vals = [float(x) for x in (value or [])]
-            (co.setdefault("listOfDoubleVariables", [])).append({"name": name, "value": vals})
-        else:
-            raise ValueError(f"Tipo de variable no soportado: {vtype}")
-
-    def _normalize_date(self, v: Any, fmt_in: Optional[str]) -> Optional[str]:
-        if v is None or v == "":
-            return None
-        if isinstance(v, _dt.date):
-            if isinstance(v, _dt.datetime):
-                v = v.date()
-            return v.strftime(ODM_DATE_FORMAT)
-        if isinstance(v, str):
-            s = v.strip()
-            if fmt_in:
-                return _dt.datetime.strptime(s, fmt_in).date().strftime(ODM_DATE_FORMAT)
-            return _dt.date.fromisoformat(s[:10]).strftime(ODM_DATE_FORMAT)
-        raise ValueError(f"Fecha inválida ({type(v)})")
-
-
-
+    def _resolve_decision_id(self, decision_id: Optional[str]) -> str:
+        return decision_id or (self.odm_request or {}).get("__DecisionID__") or _new_decision_id()
 
 
 if __name__ == "__main__":